@@ -1,7 +1,8 @@
 import logging
 from ctypes import CDLL
-import math
-from typing import Generator, Iterable
+import time
+from bisect import bisect_right
+from typing import Iterator
 
 CDLL("libgtk4-layer-shell.so.0")
 import gi  # noqa: E402
@@ -10,17 +11,15 @@ gi.require_version("Gtk4LayerShell", "1.0")
 gi.require_version("Gtk", "4.0")
 gi.require_version("Adw", "1")
 
-import time  # noqa: E402
-
-from gi.repository import Adw, Gdk, Gio, GLib, GObject, Gtk  # noqa: E402
+from gi.repository import Adw, Gdk, GLib, Gtk  # noqa: E402
 from gi.repository import Gtk4LayerShell as LayerShell  # noqa: E402
 
 from ._config import (  # noqa: E402
-    DEFAULT_CSS_PROVIDER,
-    DEFAULT_DARK_CSS_PROVIDER,
-    DEFAULT_DARK_USER_CSS_PROVIDER,
-    DEFAULT_USER_CSS_PROVIDER,
     config,
+    get_css_provider,
+    get_dark_css_provider,
+    get_dark_user_css_provider,
+    get_user_css_provider,
 )
 
 from ._monitor import (  # noqa: E402
@@ -35,14 +34,36 @@ logger = logging.getLogger(__name__)
 
 
 def ease_out_cubic(t):
-    return 1 - pow(1 - t, 3)
+    u = 1.0 - t
+    return 1.0 - u * u * u
+
+
+def _prefers_reduced_motion(settings: Gtk.Settings) -> bool:
+    if not settings.props.gtk_enable_animations:
+        return True
+
+    # gtk-interface-reduced-motion is only available in GTK >= 4.20
+    if settings.find_property("gtk-interface-reduced-motion") is not None:
+        return settings.props.gtk_interface_reduced_motion == Gtk.ReducedMotion.REDUCE
+    return False
 
 
 class GenericTransition:
     def __init__(
-        self, method, *, before, setter, initial, target, duration=200, easing=None
+        self,
+        method,
+        *,
+        widget,
+        before,
+        setter,
+        initial,
+        target,
+        duration=200,
+        easing=None,
     ):
-        self._timer_id = None
+        self._tick_id = None
+        self._start_time = None
+        self.widget = widget
         self.initial = initial
         self.target = target
         self._current = None
@@ -51,6 +72,18 @@ class GenericTransition:
         self.before = before
         self.duration = duration
         self.easing = easing
+        self._reduced_motion = False
+        settings = Gtk.Settings.get_default()
+        if settings is not None:
+            self._reduced_motion = _prefers_reduced_motion(settings)
+            settings.connect("notify::gtk-enable-animations", self._on_motion_change)
+            if settings.find_property("gtk-interface-reduced-motion") is not None:
+                settings.connect(
+                    "notify::gtk-interface-reduced-motion", self._on_motion_change
+                )
+
+    def _on_motion_change(self, settings, _prop):
+        self._reduced_motion = _prefers_reduced_motion(settings)
 
     def __call__(self, *args, **kwargs):
         before = self.before(*args, **kwargs)
@@ -66,11 +99,14 @@ class GenericTransition:
             target = self.target
 
         self._current = initial
-        easing = self.easing
-        if easing is None:
-            easing = ease_out_cubic
-
-        if duration == 0:
+        # Transitions no longer than one frame (~16ms) would only ever
+        # draw the target value
+        if duration <= 16 or self._reduced_motion:
+            # A transition still running in the other direction would
+            # otherwise overwrite the target on its next tick
+            if self._tick_id is not None:
+                self.widget.remove_tick_callback(self._tick_id)
+                self._tick_id = None
             self.setter(target)
             self.method(*args, **kwargs)
             return
@@ -79,32 +115,50 @@ class GenericTransition:
             self.setter(initial)
             self.method(*args, **kwargs)
 
-        def idle_add():
-            delta = target - initial
-            start_time = time.monotonic()
-
-            def do_animation():
-                elapsed = (time.monotonic() - start_time) * 1000
-                t = min(elapsed / duration, 1.0)
-                eased_t = easing(t)
-                self._current = initial + delta * eased_t
-                if t < 1.0:
-                    self.setter(self._current)
-                    return True
-                else:
-                    self._timer_id = None
-                    self._current = None
-                    self.setter(target)
-                    if not before:
-                        self.method(*args, **kwargs)
-                    return False
-
-            if self._timer_id is not None:
-                GLib.source_remove(self._timer_id)
+        self._initial = initial
+        self._target = target
+        self._delta = target - initial
+        # Frame times are in microseconds and the duration in milliseconds
+        self._inv_duration = 1.0 / (duration * 1000)
+        self._easing = self.easing if self.easing is not None else ease_out_cubic
+        self._before = before
+        self._args = args
+        self._kwargs = kwargs
+        self._start_time = None
+        if self._tick_id is not None:
+            self.widget.remove_tick_callback(self._tick_id)
+
+        # The first tick marks the start of the animation
+        self._tick_id = self.widget.add_tick_callback(self._do_tick)
+
+    def _do_tick(self, widget, frame_clock):
+        frame_time = frame_clock.get_frame_time()
+        start_time = self._start_time
+        if start_time is None:
+            start_time = self._start_time = frame_time
+
+        t = (frame_time - start_time) * self._inv_duration
+        if t < 1.0:
+            current = self._initial + self._delta * self._easing(t)
+            self._current = current
+            self.setter(current)
+            return GLib.SOURCE_CONTINUE
+        else:
+            self._tick_id = None
+            self._current = None
+            self.setter(self._target)
+            if not self._before:
+                self.method(*self._args, **self._kwargs)
+            return GLib.SOURCE_REMOVE
 
-            self._timer_id = GLib.timeout_add(16, do_animation)
 
-        GLib.idle_add(idle_add)
+# The state CSS classes of a segment, keyed by (active, warning)
+_SEGMENT_CSS_CLASSES = {
+    (False, False): (),
+    (True, False): ("active",),
+    (False, True): ("warning",),
+    (True, True): ("active", "warning"),
+}
 
 
 class StatusSegment(Gtk.Box):
@@ -114,18 +168,20 @@ class StatusSegment(Gtk.Box):
         self.set_hexpand(True)
         self.set_vexpand(True)
         self.set_size_request(width, height)
-
-    def set_active(self, active):
-        if active:
-            self.add_css_class("active")
-        else:
-            self.remove_css_class("active")
-
-    def set_warning(self, warning):
-        if warning:
-            self.add_css_class("warning")
-        else:
-            self.remove_css_class("warning")
+        self._state = (False, False)
+        # set_css_classes replaces every class, so keep those set by Gtk
+        # (e.g. the orientation) in each list
+        base = self.get_css_classes()
+        self._css_classes = {
+            state: [*base, *classes]
+            for state, classes in _SEGMENT_CSS_CLASSES.items()
+        }
+
+    def update_state(self, active: bool, warning: bool):
+        state = (active, warning)
+        if state != self._state:
+            self._state = state
+            self.set_css_classes(self._css_classes[state])
 
 
 class StatusBar(Gtk.Box):
@@ -135,23 +191,36 @@ class StatusBar(Gtk.Box):
         )
         self.levels = levels
         self.exponent = exponent
+        # The level at which segment i becomes active
+        self._thresholds = [(i / levels) ** exponent for i in range(1, levels + 1)]
         self.set_hexpand(True)
-        for i in range(levels):
-            self.append(StatusSegment(height=6))
+        self._segments = [StatusSegment(height=6) for _ in range(levels)]
+        for segment in self._segments:
+            self.append(segment)
+        # Bit i is set if segment i is active
+        self._active_mask = 0
+        self._prev_warning = False
 
-    def __iter__(self) -> Iterable[StatusSegment]:
-        current = self.get_first_child()
-        while current is not None:
-            yield current
-            current = current.get_next_sibling()
+    def __iter__(self) -> Iterator[StatusSegment]:
+        return iter(self._segments)
 
     def set_level(self, level: float):
-        level = max(0.0, min(1.0, level))
-        level = level ** (1 / self.exponent)
-        filled_levels = math.floor(self.levels * level)
-        for i, status_segment in enumerate(list(self)):
-            status_segment.set_active(i < filled_levels)
-            status_segment.set_warning(level > 1.0)
+        warning = level > 1.0
+        filled_levels = bisect_right(self._thresholds, level)
+        active_mask = (1 << filled_levels) - 1
+        if warning != self._prev_warning:
+            changed = (1 << self.levels) - 1
+            self._prev_warning = warning
+        else:
+            changed = active_mask ^ self._active_mask
+
+        while changed:
+            lsb = changed & -changed
+            self._segments[lsb.bit_length() - 1].update_state(
+                bool(active_mask & lsb), warning
+            )
+            changed ^= lsb
+        self._active_mask = active_mask
 
 
 class StatusIndicator(Gtk.Box):
@@ -178,16 +247,37 @@ class StatusIndicator(Gtk.Box):
             self.status_bar = None
         self._model_value_id = None
         self._model_icon_id = None
+        self._pending = {}
+        self._flush_id = None
         self.model = model
         self._model_value_id = self.model.connect(
-            "notify::value", lambda model, prop: self.on_value_change(model.value)
-        )
-        self._model_icon_id = self.model.connect(
-            "notify::icon", lambda model, prop: self.on_icon_change(model.icon)
+            "notify::value", self._on_value_notify
         )
+        self._model_icon_id = self.model.connect("notify::icon", self._on_icon_notify)
         self.on_value_change(model.value)
         self.on_icon_change(model.icon)
 
+    def _on_value_notify(self, model, _prop):
+        self._schedule_flush("value", model.value)
+
+    def _on_icon_notify(self, model, _prop):
+        self._schedule_flush("icon", model.icon)
+
+    def _schedule_flush(self, name, value):
+        # Apply all changes made during a frame at once on the next tick
+        self._pending[name] = value
+        if self._flush_id is None:
+            self._flush_id = self.add_tick_callback(self._flush)
+
+    def _flush(self, widget, frame_clock):
+        self._flush_id = None
+        pending, self._pending = self._pending, {}
+        if "value" in pending:
+            self.on_value_change(pending["value"])
+        if "icon" in pending:
+            self.on_icon_change(pending["icon"])
+        return GLib.SOURCE_REMOVE
+
     def on_value_change(self, progress):
         if self.status_bar is not None:
             self.status_bar.set_level(progress)
@@ -210,6 +300,7 @@ class KlarWindow(Gtk.Window):
         )
         main_view.append(self.stack)
         self.set_child(main_view)
+        self._last_opacity = None
 
         def show_hide_duration(visible):
             return (
@@ -220,13 +311,28 @@ class KlarWindow(Gtk.Window):
 
         self.set_visible = GenericTransition(
             self.set_visible,
+            widget=self,
             before=lambda x: x,
-            setter=self.set_opacity,
+            setter=self._set_opacity,
             initial=0.01,
             target=1.0,
             duration=show_hide_duration,
         )
 
+    def _set_opacity(self, opacity):
+        # Skip changes that are too small to be visible, but always land on
+        # the endpoints so a shown window is fully opaque
+        transition = self.set_visible
+        if (
+            opacity != transition.initial
+            and opacity != transition.target
+            and self._last_opacity is not None
+            and abs(opacity - self._last_opacity) < 1e-3
+        ):
+            return
+        self._last_opacity = opacity
+        self.set_opacity(opacity)
+
     def add_status_indicator(self, status_indicator: StatusIndicator):
         self.stack.add_named(status_indicator, status_indicator.get_name())
 
@@ -234,30 +340,42 @@ class KlarWindow(Gtk.Window):
         self.stack.set_visible_child_name(name)
 
 
-def create_monitors() -> Generator[Monitor]:
-    if config.monitor.display.enabled:
-        yield BrightnessMonitor(
+_MONITOR_FACTORIES = (
+    (
+        lambda c: c.display.enabled,
+        lambda c: BrightnessMonitor(
             "display-brightness-symbolic",
-            file=config.monitor.display.device,
-            max_brightness=config.monitor.display.max_brightness,
-            levels=config.monitor.display.levels,
-            exponent=config.monitor.display.exponent,
-        )
-
-    if config.monitor.keyboard.enabled:
-        yield BrightnessMonitor(
+            file=c.display.device,
+            max_brightness=c.display.max_brightness,
+            levels=c.display.levels,
+            exponent=c.display.exponent,
+        ),
+    ),
+    (
+        lambda c: c.keyboard.enabled,
+        lambda c: BrightnessMonitor(
             "keyboard-brightness-symbolic",
-            file=config.monitor.keyboard.device,
-            max_brightness=config.monitor.keyboard.max_brightness,
-            levels=config.monitor.keyboard.levels,
-            exponent=config.monitor.keyboard.exponent,
-        )
+            file=c.keyboard.device,
+            max_brightness=c.keyboard.max_brightness,
+            levels=c.keyboard.levels,
+            exponent=c.keyboard.exponent,
+        ),
+    ),
+    (lambda c: c.power.enabled, lambda c: PowerMonitor()),
+    (
+        lambda c: c.pulseaudio.enabled,
+        lambda c: PulseAudioMonitor(levels=c.pulseaudio.levels),
+    ),
+)
 
-    if config.monitor.power.enabled:
-        yield PowerMonitor()
 
-    if config.monitor.pulseaudio.enabled:
-        yield PulseAudioMonitor(levels=config.monitor.pulseaudio.levels)
+def create_monitors() -> list[Monitor]:
+    monitor_config = config.monitor
+    return [
+        factory(monitor_config)
+        for enabled, factory in _MONITOR_FACTORIES
+        if enabled(monitor_config)
+    ]
 
 
 class KlarApp(Adw.Application):
@@ -267,12 +385,22 @@ class KlarApp(Adw.Application):
         super().__init__(application_id="se.samsten.klar")
         self.window = None
         self._timer_id = None
+        self._hide_deadline = 0.0
+        self._monitors: list[Monitor] = []
 
     def do_activate(self):
+        def hide():
+            if self.window is not None:
+                self.window.set_visible(False)
+            self._timer_id = None
+            return False
+
         def show_callback(model, _prop):
             if self.window is None:
                 return
 
+            self.window.switch_to(model.name)
+            now = time.monotonic()
             if self._timer_id is None:
                 self.window.set_visible(True)
                 display = Gdk.Display.get_default()
@@ -280,34 +408,33 @@ class KlarApp(Adw.Application):
                 if display is not None and surface is not None:
                     monitor = display.get_monitor_at_surface(surface)
                     LayerShell.set_monitor(self.window, monitor)
+            elif self._hide_deadline - now > 0.9:
+                # The hide timer was just rescheduled so we keep it
+                return
             else:
                 GLib.source_remove(self._timer_id)
 
-            self.window.switch_to(model.name)
-
-            def hide():
-                if self.window is not None:
-                    self.window.set_visible(False)
-                self._timer_id = None
-                return False
+            self._hide_deadline = now + 1.0
+            self._timer_id = GLib.timeout_add_seconds(
+                1, hide, priority=GLib.PRIORITY_DEFAULT_IDLE
+            )
 
-            self._timer_id = GLib.timeout_add(1000, hide)
+        def on_started(monitor):
+            logger.info(
+                "%s has been started and is listening", monitor.__class__.__name__
+            )
+            status_model = monitor.new_model()
+            status_model.connect("notify", show_callback)
+            status_indicator = StatusIndicator(
+                model=status_model, icon_size=config.appearance.icon_size
+            )
+            self.window.add_status_indicator(status_indicator)
 
         self.window = KlarWindow(self)
-        for monitor in create_monitors():
+        self._monitors = create_monitors()
+        for monitor in self._monitors:
+            monitor.connect("started", on_started)
             monitor.start()
-            if monitor.is_started():
-                logger.info(
-                    "%s has been started and is listening", monitor.__class__.__name__
-                )
-                status_model = monitor.new_model()
-                status_model.connect("notify", show_callback)
-                status_indicator = StatusIndicator(
-                    model=status_model, icon_size=config.appearance.icon_size
-                )
-                self.window.add_status_indicator(status_indicator)
-            else:
-                logger.info("%s could not be started", monitor.__class__.__name__)
 
         LayerShell.init_for_window(self.window)
         LayerShell.set_namespace(self.window, "klar")
@@ -326,13 +453,14 @@ def main():
     if display is not None:
         Gtk.StyleContext.add_provider_for_display(
             display,
-            DEFAULT_CSS_PROVIDER,
+            get_css_provider(),
             Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION,
         )
-        if DEFAULT_USER_CSS_PROVIDER is not None:
+        user_css_provider = get_user_css_provider()
+        if user_css_provider is not None:
             Gtk.StyleContext.add_provider_for_display(
                 display,
-                DEFAULT_USER_CSS_PROVIDER,
+                user_css_provider,
                 Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION + 2,
             )
     else:
@@ -343,6 +471,9 @@ def main():
 
     if config.appearance.system_theme == "auto":
         app.get_style_manager().connect("notify::dark", on_dark)
+        # Parse the dark styles once the main loop is idle so that the
+        # first switch to dark mode is instant
+        GLib.idle_add(_load_dark_style, priority=GLib.PRIORITY_LOW)
 
     app.register(None)
     if app.get_is_remote():
@@ -358,28 +489,36 @@ def on_dark(style_manager, _prop):
         display = Gdk.Display.get_default()
         if display is not None:
             Gtk.StyleContext.remove_provider_for_display(
-                display, DEFAULT_DARK_CSS_PROVIDER
+                display, get_dark_css_provider()
             )
-            if DEFAULT_DARK_USER_CSS_PROVIDER is not None:
+            dark_user_css_provider = get_dark_user_css_provider()
+            if dark_user_css_provider is not None:
                 Gtk.StyleContext.remove_provider_for_display(
-                    display, DEFAULT_DARK_USER_CSS_PROVIDER
+                    display, dark_user_css_provider
                 )
         else:
             logger.error("Could not find default display")
 
 
+def _load_dark_style():
+    get_dark_css_provider()
+    get_dark_user_css_provider()
+    return False
+
+
 def _set_dark_style():
     display = Gdk.Display.get_default()
     if display is not None:
         Gtk.StyleContext.add_provider_for_display(
             display,
-            DEFAULT_DARK_CSS_PROVIDER,
+            get_dark_css_provider(),
             Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION + 1,
         )
-        if DEFAULT_DARK_USER_CSS_PROVIDER is not None:
+        dark_user_css_provider = get_dark_user_css_provider()
+        if dark_user_css_provider is not None:
             Gtk.StyleContext.add_provider_for_display(
                 display,
-                DEFAULT_DARK_USER_CSS_PROVIDER,
+                dark_user_css_provider,
                 Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION + 3,
             )
     else:
@@ -1,3 +1,4 @@
+import functools
 import tomllib
 import os
 from pathlib import Path
@@ -14,56 +15,63 @@ import logging
 logging.basicConfig()
 logger = logging.getLogger(__name__)
 
+_CONFIG_HOME = os.environ.get("XDG_CONFIG_HOME") or os.path.expanduser("~/.config")
+
 
 def load_system_style(filename="style.css", priority=0):
-    with importlib.resources.files("klar.resources").joinpath(filename).open("rb") as f:
-        provider = Gtk.CssProvider()
-        css_data = f.read()
-        provider.load_from_data(css_data)
-        return provider
+    provider = Gtk.CssProvider()
+    resource = importlib.resources.files("klar.resources").joinpath(filename)
+    with importlib.resources.as_file(resource) as path:
+        provider.load_from_path(str(path))
+    return provider
 
 
 def load_user_style(filename="style.css"):
-    config_home = os.environ.get("XDG_CONFIG_HOME", os.path.expanduser("~/.config"))
-    user_css_path = os.path.join(config_home, "klar", filename)
+    user_css_path = os.path.join(_CONFIG_HOME, "klar", filename)
     if os.path.isfile(user_css_path):
-        with open(user_css_path, "rb") as f:
-            user_provider = Gtk.CssProvider()
-            css_data = f.read()
-            user_provider.load_from_data(css_data)
-            return user_provider
+        user_provider = Gtk.CssProvider()
+        user_provider.load_from_path(user_css_path)
+        return user_provider
     return None
 
 
+def _read_sysfs_int(path) -> int:
+    fd = os.open(path, os.O_RDONLY | os.O_CLOEXEC)
+    try:
+        return int(os.read(fd, 32))
+    finally:
+        os.close(fd)
+
+
 def _guess_brightness_provider(base: Path) -> Tuple[str | None, int | None]:
-    if not base.is_dir():
-        return None
+    if not os.path.isdir(base):
+        return None, None
 
-    best: Path | None = None
+    best: str | None = None
     best_max: int = -1
-    for subdir in base.iterdir():
-        max_brightness_file = subdir / "max_brightness"
-        brightness_file = subdir / "brightness"
+    with os.scandir(base) as it:
+        for entry in it:
+            max_brightness_file = f"{entry.path}/max_brightness"
+            brightness_file = f"{entry.path}/brightness"
 
-        if max_brightness_file.is_file() and brightness_file.is_file():
-            with open(max_brightness_file) as f:
-                max_brightness = int(f.read())
+            if os.path.isfile(max_brightness_file) and os.path.isfile(brightness_file):
+                max_brightness = _read_sysfs_int(max_brightness_file)
 
-            if max_brightness > best_max:
-                best = brightness_file
-                best_max = max_brightness
+                if max_brightness > best_max:
+                    best = brightness_file
+                    best_max = max_brightness
 
     if best is not None:
         logger.info("Guessing brightness file %s", best)
-    else:
-        logger.error("Failed to guess brigness provider, please pass one explicitly")
-    return best.as_posix(), best_max
+        return best, best_max
+
+    logger.error("Failed to guess brigness provider, please pass one explicitly")
+    return None, None
 
 
 def _get_max_brightness(file: Path) -> int | None:
     try:
-        with open(file) as f:
-            return int(f.read())
+        return _read_sysfs_int(file)
     except Exception:
         logger.exception("Failed to get maximum brightness for %s", file)
         return None
@@ -165,8 +173,7 @@ def _load_brightness_config(section: dict, base_path: Path):
 
 
 def load_configuration(config_path=None):
-    config_home = os.environ.get("XDG_CONFIG_HOME", os.path.expanduser("~/.config"))
-    config_dir = os.path.join(config_home, "klar")
+    config_dir = os.path.join(_CONFIG_HOME, "klar")
     if config_path is None:
         config_path = os.path.join(config_dir, "config.toml")
     if os.path.isfile(config_path):
@@ -221,10 +228,24 @@ def load_configuration(config_path=None):
     )
 
 
-config = load_configuration()
+@functools.cache
+def get_css_provider() -> Gtk.CssProvider:
+    return load_system_style(filename="style.css")
 
-DEFAULT_CSS_PROVIDER = load_system_style(filename="style.css")
-DEFAULT_DARK_CSS_PROVIDER = load_system_style(filename="style-dark.css")
 
-DEFAULT_USER_CSS_PROVIDER = load_user_style(filename="style.css")
-DEFAULT_DARK_USER_CSS_PROVIDER = load_user_style(filename="style-dark.css")
+@functools.cache
+def get_dark_css_provider() -> Gtk.CssProvider:
+    return load_system_style(filename="style-dark.css")
+
+
+@functools.cache
+def get_user_css_provider() -> Gtk.CssProvider | None:
+    return load_user_style(filename="style.css")
+
+
+@functools.cache
+def get_dark_user_css_provider() -> Gtk.CssProvider | None:
+    return load_user_style(filename="style-dark.css")
+
+
+config = load_configuration()
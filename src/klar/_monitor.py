@@ -1,16 +1,43 @@
+import ctypes
+import errno
+import functools
 import logging
+import os
+import socket
+import struct
 import threading
+from bisect import bisect_right
 from typing import override
 
-import pulsectl
 from gi.repository import Gio, GLib, GObject
 
 logger = logging.getLogger(__name__)
 
 
+def _explicit_property(name: str, type, default) -> GObject.Property:
+    """A property that only emits notify when the value actually changes."""
+    attr = f"_{name}"
+
+    def getter(self):
+        return getattr(self, attr, default)
+
+    def setter(self, value):
+        if getattr(self, attr, default) != value:
+            setattr(self, attr, value)
+            self.notify(name)
+
+    return GObject.Property(
+        getter=getter,
+        setter=setter,
+        type=type,
+        default=default,
+        flags=GObject.ParamFlags.READWRITE | GObject.ParamFlags.EXPLICIT_NOTIFY,
+    )
+
+
 class StatusModel(GObject.Object):
-    value = GObject.Property(type=float, default=0)
-    icon = GObject.Property(type=Gio.Icon, default=None)
+    value = _explicit_property("value", float, 0.0)
+    icon = _explicit_property("icon", Gio.Icon, None)
     name: str
     levels: int
 
@@ -22,6 +49,8 @@ class StatusModel(GObject.Object):
 
 
 class Monitor(GObject.Object):
+    __gsignals__ = {"started": (GObject.SignalFlags.RUN_FIRST, None, ())}
+
     levels: int
 
     def __init__(self, levels: int = 0):
@@ -29,7 +58,12 @@ class Monitor(GObject.Object):
         self.levels = levels
 
     def start(self) -> None:
+        """Start the monitor and emit started if it succeeds."""
         self.do_start()
+        if self.is_started():
+            self.emit("started")
+        else:
+            logger.info("%s could not be started", self.__class__.__name__)
 
     def close(self) -> None:
         self.do_stop()
@@ -53,15 +87,18 @@ class FileMonitor(Monitor):
         self._file = file
         self._file_monitor: Gio.FileMonitor | None = None
         self._file_monitor_id: int | None = None
+        self._fd: int | None = None
 
     @override
     def do_start(self):
         if self._file is not None and self._file.query_exists(None):
             logger.debug("The file %s is monitored for change", self._file.get_path())
             self._file_monitor = self._file.monitor(Gio.FileMonitorFlags.NONE, None)
+            self._file_monitor.set_rate_limit(50)
             self._file_monitor_id = self._file_monitor.connect(
                 "changed", self._on_file_change
             )
+            self._fd = os.open(self._file.get_path(), os.O_RDONLY | os.O_CLOEXEC)
         else:
             if self._file is not None:
                 logger.debug("The file %s does not exist", self._file.get_path())
@@ -72,24 +109,169 @@ class FileMonitor(Monitor):
 
     @override
     def do_stop(self) -> None:
-        if self._file is not None:
+        if self._file_monitor is not None:
             self._file_monitor.cancel()
             self._file_monitor.disconnect(self._file_monitor_id)
             self._file_monitor_id = None
             self._file_monitor = None
-            self._file = None
+        self._file = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
 
     def _on_file_change(self, monitor, file, other_file, event_type):
         if event_type == Gio.FileMonitorEvent.CHANGES_DONE_HINT:
-            with open(file) as file:
-                self.on_change(file.read())
+            # sysfs regenerates the value on every read, so we can keep
+            # the file open and read from the start.
+            self.on_change(os.pread(self._fd, 32, 0))
 
-    def on_change(self, data: str) -> None:
+    def on_change(self, data: bytes) -> None:
         pass
 
 
+# From linux/netlink.h and linux/filter.h, not exposed by the socket module
+_NETLINK_KOBJECT_UEVENT = 15
+_SO_ATTACH_FILTER = 26
+_BPF_LD_ABS = {4: 0x20, 2: 0x28, 1: 0x30}
+_BPF_LD_LEN = 0x80
+_BPF_JEQ_K = 0x15
+_BPF_JGE_K = 0x35
+_BPF_RET_K = 0x06
+
+
+def _backlight_devpath(file: str) -> str | None:
+    """Return the kernel DEVPATH of a backlight brightness file, if any."""
+    device = os.path.realpath(os.path.dirname(file))
+    subsystem = os.path.realpath(os.path.join(device, "subsystem"))
+    if subsystem.endswith("/class/backlight") and device.startswith("/sys/"):
+        return device.removeprefix("/sys")
+    return None
+
+
+def _open_uevent_socket() -> socket.socket:
+    sock = socket.socket(
+        socket.AF_NETLINK,
+        socket.SOCK_RAW | socket.SOCK_CLOEXEC | socket.SOCK_NONBLOCK,
+        _NETLINK_KOBJECT_UEVENT,
+    )
+    # Multicast group 1 receives the events sent by the kernel
+    sock.bind((0, 1))
+    return sock
+
+
+def _uevent_filter(devpaths) -> list[tuple[int, int, int, int]]:
+    """Build a classic BPF program accepting change uevents of devpaths."""
+    program = []
+    for devpath in devpaths:
+        # Kernel uevents start with ACTION@DEVPATH followed by a NUL
+        header = b"change@" + devpath + b"\0"
+        checks = []
+        offset = 0
+        while offset < len(header):
+            left = len(header) - offset
+            size = 4 if left >= 4 else 2 if left >= 2 else 1
+            value = int.from_bytes(header[offset : offset + size], "big")
+            checks.append((size, offset, value))
+            offset += size
+
+        # On mismatch, jump past the remaining checks to the next device.
+        # Loads past the end of the packet would reject it outright, so
+        # check the length first.
+        program.append((_BPF_LD_LEN, 0, 0, 0))
+        program.append((_BPF_JGE_K, 0, 2 * len(checks) + 1, len(header)))
+        for i, (size, offset, value) in enumerate(checks):
+            program.append((_BPF_LD_ABS[size], 0, 0, offset))
+            program.append((_BPF_JEQ_K, 0, 2 * (len(checks) - i) - 1, value))
+        program.append((_BPF_RET_K, 0, 0, 0xFFFFFFFF))
+    program.append((_BPF_RET_K, 0, 0, 0))
+    return program
+
+
+def _attach_filter(sock: socket.socket, program) -> None:
+    insns = b"".join(struct.pack("HBBI", *insn) for insn in program)
+    buf = ctypes.create_string_buffer(insns, len(insns))
+    fprog = struct.pack("HP", len(program), ctypes.addressof(buf))
+    sock.setsockopt(socket.SOL_SOCKET, _SO_ATTACH_FILTER, fprog)
+
+
+class _UeventListener:
+    """Dispatch backlight uevents from a single netlink socket."""
+
+    def __init__(self) -> None:
+        self._socket: socket.socket | None = None
+        self._source_id: int | None = None
+        self._monitors: dict[bytes, "BrightnessMonitor"] = {}
+
+    def add(self, devpath: bytes, monitor: "BrightnessMonitor") -> None:
+        if self._socket is None:
+            self._socket = _open_uevent_socket()
+            self._source_id = GLib.unix_fd_add_full(
+                GLib.PRIORITY_DEFAULT,
+                self._socket.fileno(),
+                GLib.IOCondition.IN,
+                self._on_uevent,
+            )
+        self._monitors[devpath] = monitor
+        self._update_filter()
+
+    def remove(self, devpath: bytes) -> None:
+        self._monitors.pop(devpath, None)
+        if self._socket is None:
+            return
+        if self._monitors:
+            self._update_filter()
+        else:
+            GLib.source_remove(self._source_id)
+            self._source_id = None
+            self._socket.close()
+            self._socket = None
+
+    def _update_filter(self) -> None:
+        # The socket receives every uevent of every subsystem, let the
+        # kernel drop those we do not care about instead of waking us up.
+        try:
+            _attach_filter(self._socket, _uevent_filter(self._monitors))
+        except (OSError, struct.error):
+            logger.debug("Could not attach a uevent filter", exc_info=True)
+
+    def _on_uevent(self, fd, condition):
+        changed = set()
+        while True:
+            try:
+                data = self._socket.recv(8192)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                if e.errno != errno.ENOBUFS:
+                    logger.exception("Failed to receive uevents")
+                    break
+                # The receive buffer overran and events were dropped, so
+                # we no longer know which devices changed.
+                changed.update(self._monitors.values())
+                continue
+
+            # The payload is ACTION@DEVPATH followed by NUL separated KEY=VALUE
+            action, _, devpath = data.partition(b"\0")[0].partition(b"@")
+            if action == b"change":
+                monitor = self._monitors.get(devpath)
+                if monitor is not None:
+                    changed.add(monitor)
+
+        for monitor in changed:
+            monitor.on_uevent()
+        return GLib.SOURCE_CONTINUE
+
+
+_uevent_listener = _UeventListener()
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_ratio(data: bytes, max_brightness: int) -> float:
+    return int(data) / max_brightness
+
+
 class BrightnessMonitor(FileMonitor):
-    brightness = GObject.Property(type=float, default=0.0)
+    brightness = _explicit_property("brightness", float, 0.0)
 
     def __init__(
         self, icon, *, file: str, max_brightness: int, levels: int, exponent: float
@@ -98,10 +280,54 @@ class BrightnessMonitor(FileMonitor):
         self.icon = icon
         self.max_brightness = max_brightness
         self.exponent = exponent
+        self._devpath: bytes | None = None
 
     @override
-    def on_change(self, data: str) -> None:
-        self.brightness = int(data) / self.max_brightness
+    def do_start(self):
+        # The kernel emits a uevent for every change of a backlight, which
+        # is more reliable than inotify on sysfs. LEDs do not, so they (and
+        # systems without netlink) fall back to monitoring the file.
+        path = self._file.get_path() if self._file is not None else None
+        devpath = None
+        if path is not None and hasattr(socket, "AF_NETLINK"):
+            devpath = _backlight_devpath(path)
+
+        if devpath is not None:
+            try:
+                fd = os.open(path, os.O_RDONLY | os.O_CLOEXEC)
+            except OSError:
+                logger.debug("Could not open %s", path)
+            else:
+                try:
+                    _uevent_listener.add(devpath.encode(), self)
+                except OSError:
+                    logger.debug("Could not listen to uevents for %s", devpath)
+                    os.close(fd)
+                else:
+                    logger.debug("The device %s is monitored for uevents", devpath)
+                    self._fd = fd
+                    self._devpath = devpath.encode()
+                    return
+
+        super().do_start()
+
+    @override
+    def is_started(self) -> bool:
+        return self._devpath is not None or super().is_started()
+
+    @override
+    def do_stop(self) -> None:
+        if self._devpath is not None:
+            _uevent_listener.remove(self._devpath)
+            self._devpath = None
+        super().do_stop()
+
+    def on_uevent(self) -> None:
+        self.on_change(os.pread(self._fd, 32, 0))
+
+    @override
+    def on_change(self, data: bytes) -> None:
+        self.brightness = _parse_ratio(data, self.max_brightness)
 
     def new_model(self):
         path = self._file.get_path()
@@ -114,75 +340,175 @@ class BrightnessMonitor(FileMonitor):
         return model
 
 
+# Lower bounds (inclusive) of the battery levels 20, 40, 60, 80 and 100.
+_BATTERY_THRESHOLDS = (15, 35, 55, 75, 95)
+_BATTERY_ICONS = tuple(
+    Gio.ThemedIcon.new_with_default_fallbacks(f"battery-level-{level}-symbolic")
+    for level in (10, 20, 40, 60, 80, 100)
+)
+_BATTERY_CHARGING_ICONS = tuple(
+    Gio.ThemedIcon.new_with_default_fallbacks(
+        f"battery-level-{level}-charging-symbolic"
+    )
+    for level in (10, 20, 40, 60, 80, 100)
+)
+
+
 class PowerMonitor(Monitor):
-    connected = GObject.Property(type=bool, default=False)
+    connected = _explicit_property("connected", bool, False)
+    percentage = _explicit_property("percentage", float, 0.0)
 
     def __init__(self) -> None:
         super().__init__()
-        self._dbus_ac_proxy = None
+        self._connection = None
+        self._pending_calls = 0
+        self._ac_path = None
+        self._ac_subscription_id = None
         self._dbus_batter_proxy = None
-        self._dbus_ac_proxy_id = None
+        self._dbus_battery_proxy_id = None
+        self._battery_present = False
 
-    def _get_ac_and_battery_proxy(
-        self,
-    ) -> tuple[Gio.DBusProxy | None, Gio.DBusProxy | None]:
-        upower_proxy = Gio.DBusProxy.new_for_bus_sync(
-            Gio.BusType.SYSTEM,
-            Gio.DBusProxyFlags.NONE,
-            None,
+    @override
+    def start(self) -> None:
+        # UPower is queried asynchronously; started is emitted once both the
+        # AC and the battery have been resolved.
+        self.do_start()
+
+    @override
+    def do_start(self):
+        Gio.bus_get(Gio.BusType.SYSTEM, None, self._on_bus_ready)
+
+    def _on_bus_ready(self, _source, result):
+        try:
+            self._connection = Gio.bus_get_finish(result)
+        except GLib.Error:
+            logger.exception("%s could not be started", self.__class__.__name__)
+            return
+
+        self._pending_calls = 2
+        self._connection.call(
             "org.freedesktop.UPower",
             "/org/freedesktop/UPower",
             "org.freedesktop.UPower",
+            "EnumerateDevices",
+            None,
+            GLib.VariantType("(ao)"),
+            Gio.DBusCallFlags.NONE,
+            -1,
             None,
+            self._on_devices_enumerated,
         )
+        # The display device aggregates all batteries (UPower >= 0.99)
+        Gio.DBusProxy.new(
+            self._connection,
+            Gio.DBusProxyFlags.NONE,
+            None,
+            "org.freedesktop.UPower",
+            "/org/freedesktop/UPower/devices/DisplayDevice",
+            "org.freedesktop.UPower.Device",
+            None,
+            self._on_battery_proxy_ready,
+        )
+
+    def _on_devices_enumerated(self, connection, result):
+        try:
+            (paths,) = connection.call_finish(result).unpack()
+        except GLib.Error:
+            logger.exception("Failed to enumerate UPower devices")
+            self._on_call_done()
+            return
+
+        # UPower names device objects after their kind
+        for obj_path in paths:
+            if obj_path.rpartition("/")[2].startswith("line_power_"):
+                self._ac_path = obj_path
+                break
+        else:
+            self._on_call_done()
+            return
 
-        result = upower_proxy.call_sync(
-            "EnumerateDevices", None, Gio.DBusCallFlags.NONE, -1, None
+        connection.call(
+            "org.freedesktop.UPower",
+            self._ac_path,
+            "org.freedesktop.DBus.Properties",
+            "Get",
+            GLib.Variant("(ss)", ("org.freedesktop.UPower.Device", "Online")),
+            GLib.VariantType("(v)"),
+            Gio.DBusCallFlags.NONE,
+            -1,
+            None,
+            self._on_ac_online,
         )
 
-        ac_device_proxy = None
-        battery_device_proxy = None
-        for obj_path in result.unpack()[0]:
-            device_proxy = Gio.DBusProxy.new_for_bus_sync(
-                Gio.BusType.SYSTEM,
-                Gio.DBusProxyFlags.NONE,
-                None,
+    def _on_ac_online(self, connection, result):
+        try:
+            (self.connected,) = connection.call_finish(result).unpack()
+        except GLib.Error:
+            logger.exception("Failed to get the state of %s", self._ac_path)
+        else:
+            self._ac_subscription_id = connection.signal_subscribe(
                 "org.freedesktop.UPower",
-                obj_path,
-                "org.freedesktop.UPower.Device",
+                "org.freedesktop.DBus.Properties",
+                "PropertiesChanged",
+                self._ac_path,
                 None,
+                Gio.DBusSignalFlags.NONE,
+                self._on_ac_properties_changed,
             )
-            typ = device_proxy.get_cached_property("Type")
-            if ac_device_proxy is None and typ is not None and typ.unpack() == 1:
-                ac_device_proxy = device_proxy
-            elif battery_device_proxy is None and typ is not None and typ.unpack() == 2:
-                battery_device_proxy = device_proxy
+        self._on_call_done()
 
-            if ac_device_proxy is not None and battery_device_proxy is not None:
-                break
+    def _on_battery_proxy_ready(self, _source, result):
+        try:
+            self._dbus_batter_proxy = Gio.DBusProxy.new_finish(result)
+        except GLib.Error:
+            logger.exception("Failed to get the UPower display device")
+        else:
+            is_present = self._dbus_batter_proxy.get_cached_property("IsPresent")
+            self._battery_present = is_present is not None and is_present.unpack()
+            percentage = self._dbus_batter_proxy.get_cached_property("Percentage")
+            if percentage is not None:
+                self.percentage = percentage.unpack()
+            self._dbus_battery_proxy_id = self._dbus_batter_proxy.connect(
+                "g-properties-changed", self._on_battery_properties_changed
+            )
+        self._on_call_done()
 
-        return ac_device_proxy, battery_device_proxy
+    def _on_call_done(self):
+        self._pending_calls -= 1
+        if self._pending_calls > 0:
+            return
 
-    @override
-    def do_start(self):
-        self._dbus_ac_proxy, self._dbus_batter_proxy = self._get_ac_and_battery_proxy()
-        if self._dbus_ac_proxy is not None:
-            self._dbus_ac_proxy_id: int = self._dbus_ac_proxy.connect(
-                "g-properties-changed", self._on_properties_changed
-            )
+        if self.is_started():
+            self.emit("started")
+        else:
+            logger.info("%s could not be started", self.__class__.__name__)
 
     @override
     def is_started(self):
-        return self._dbus_ac_proxy is not None
+        return self._ac_subscription_id is not None
 
     @override
     def do_stop(self):
-        if self._dbus_ac_proxy:
-            self._dbus_ac_proxy.disconnect(self._dbus_ac_proxy_id)
-
-    def _on_properties_changed(self, proxy, changed, invalidated):
-        if "Online" in changed.keys():
-            self.connected = changed["Online"]
+        if self._ac_subscription_id is not None:
+            self._connection.signal_unsubscribe(self._ac_subscription_id)
+            self._ac_subscription_id = None
+        if self._dbus_batter_proxy:
+            self._dbus_batter_proxy.disconnect(self._dbus_battery_proxy_id)
+
+    def _on_ac_properties_changed(
+        self, connection, sender, path, interface, signal, parameters
+    ):
+        online = parameters.get_child_value(1).lookup_value("Online", None)
+        if online is not None:
+            self.connected = online.get_boolean()
+
+    def _on_battery_properties_changed(self, proxy, changed, invalidated):
+        is_present = changed.lookup_value("IsPresent", None)
+        if is_present is not None:
+            self._battery_present = is_present.get_boolean()
+        percentage = changed.lookup_value("Percentage", None)
+        if percentage is not None:
+            self.percentage = percentage.get_double()
 
     @override
     def new_model(self):
@@ -190,155 +516,176 @@ class PowerMonitor(Monitor):
             raise ValueError()
 
         model = StatusModel("ac", levels=0)
+        last_key = None
 
         def update_icon(binding, prop):
-            percentage = 0
-            if self._dbus_batter_proxy is not None:
-                if self._dbus_batter_proxy:
-                    perc_variant = self._dbus_batter_proxy.get_cached_property(
-                        "Percentage"
-                    )
-                    if perc_variant is not None:
-                        percentage = perc_variant.unpack()
-
-            if self.connected:
-                if percentage >= 95:
-                    icon_name = "battery-level-100-charging-symbolic"
-                elif percentage >= 75:
-                    icon_name = "battery-level-80-charging-symbolic"
-                elif percentage >= 55:
-                    icon_name = "battery-level-60-charging-symbolic"
-                elif percentage >= 35:
-                    icon_name = "battery-level-40-charging-symbolic"
-                elif percentage >= 15:
-                    icon_name = "battery-level-20-charging-symbolic"
-                else:
-                    icon_name = "battery-level-10-charging-symbolic"
-            else:
-                if percentage >= 95:
-                    icon_name = "battery-level-100-symbolic"
-                elif percentage >= 75:
-                    icon_name = "battery-level-80-symbolic"
-                elif percentage >= 55:
-                    icon_name = "battery-level-60-symbolic"
-                elif percentage >= 35:
-                    icon_name = "battery-level-40-symbolic"
-                elif percentage >= 15:
-                    icon_name = "battery-level-20-symbolic"
-                else:
-                    icon_name = "battery-level-10-symbolic"
+            nonlocal last_key
+            percentage = self.percentage if self._battery_present else 0
+
+            key = (self.connected, bisect_right(_BATTERY_THRESHOLDS, percentage))
+            if key == last_key:
+                return
 
-            model.icon = Gio.ThemedIcon.new_with_default_fallbacks(icon_name)
+            last_key = key
+            connected, idx = key
+            icons = _BATTERY_CHARGING_ICONS if connected else _BATTERY_ICONS
+            model.icon = icons[idx]
 
         self.connect("notify::connected", update_icon)
         return model
 
 
 class PulseAudioMonitor(Monitor):
-    volume = GObject.Property(type=float, default=0.0)
-    mute = GObject.Property(type=bool, default=False)
-    current_sink = GObject.Property(type=str, default="")
+    volume = _explicit_property("volume", float, 0.0)
+    mute = _explicit_property("mute", bool, False)
+    current_sink = _explicit_property("current_sink", str, "")
 
     def __init__(self, *, levels: int) -> None:
         super().__init__(levels=levels)
+        self._pending_indices: set[int] = set()
+        self._default_sink_idx: int | None = None
+        self._last_state: tuple[bool, float, str] | None = None
+        self._pulse = None
+        self._pulse_stop = None
+        self._stopping = False
+        self._pulse_dirty = False
+        self._pulse_event_listen_thread: threading.Thread | None = None
+        self._icons = {
+            key: Gio.ThemedIcon.new_with_default_fallbacks(
+                f"audio-volume-{key}-symbolic"
+            )
+            for key in ("muted", "low", "medium", "high", "overamplified")
+        }
 
-        self._timers_lock = threading.Lock()
-        self._timers = {}
-        self._pulse_listen = pulsectl.Pulse(
-            "klar-pulse-daemon-listen", threading_lock=True, connect=False
-        )
-        self._pulse_query = pulsectl.Pulse(
-            "klar-pulse-daemon-query", threading_lock=True, connect=False
-        )
+    def do_start(self):
+        # pulsectl pulls in libpulse; only pay for it once we are started
+        import pulsectl
 
+        self._pulse = pulsectl.Pulse(
+            "klar-pulse-daemon", threading_lock=True, connect=False
+        )
+        self._pulse_stop = pulsectl.PulseLoopStop
+        self._pulse.connect()
+        self._pulse.event_mask_set("sink", "server")
+        self._pulse.event_callback_set(self._on_pulse_event_change)
         self._pulse_event_listen_thread = threading.Thread(
-            None, self._pulse_listen.event_listen, daemon=True
+            None, self._pulse_event_listen, daemon=True
         )
-        self._is_started = False
-
-    def do_start(self):
-        try:
-            self._pulse_listen.connect()
-            self._pulse_query.connect()
-            self._pulse_listen.event_mask_set("sink", "source")
-            self._pulse_listen.event_callback_set(self._on_pulse_event_change)
-            self._pulse_event_listen_thread.start()
-        finally:
-            self._is_started = True
+        self._pulse_event_listen_thread.start()
 
     def do_stop(self):
-        self._pulse_listen.close()
-        self._pulse_query.close()
-        self._pulse_event_listen_thread.join()
+        self._stopping = True
+        thread = self._pulse_event_listen_thread
+        if thread is not None:
+            # event_listen_stop does nothing unless the poll is running, so
+            # keep poking until the thread is gone, but never wedge the exit.
+            for _ in range(20):
+                if not thread.is_alive():
+                    break
+                self._pulse.event_listen_stop()
+                thread.join(timeout=0.05)
+            if thread.is_alive():
+                logger.warning("The pulse listener thread did not stop")
+            self._pulse_event_listen_thread = None
+        if self._pulse is not None:
+            self._pulse.close()
+            self._pulse = None
 
     @override
     def is_started(self):
-        return self._is_started
+        return (
+            self._pulse_event_listen_thread is not None
+            and self._pulse_event_listen_thread.is_alive()
+        )
 
     def _on_pulse_event_change(self, ev):
-        with self._timers_lock:
-            if index := self._timers.get(ev.index):
-                GLib.source_remove(index)
-
-            # We need to debounce otherwise we get triggered on
-            # multiple events. 20ms seems to be ok...
-            self._timers[ev.index] = GLib.timeout_add(
-                20, self._on_pulse_event_timeout, ev.index
-            )
-
-    def _on_pulse_event_timeout(self, index):
+        # Called from the pulse listener thread, inside event_listen.
+        if ev.facility == "server":
+            # The default sink might have changed
+            self._default_sink_idx = None
+        else:
+            self._pending_indices.add(ev.index)
+        self._pulse_dirty = True
+        raise self._pulse_stop
+
+    def _pulse_event_listen(self):
+        # The listener thread owns the connection: pulsectl does not allow
+        # queries from another thread while event_listen is running, so
+        # sinks are queried here, between two calls to event_listen.
+        timeout = None
+        while not self._stopping:
+            self._pulse_dirty = False
+            self._pulse.event_listen(timeout=timeout)
+            if self._stopping:
+                break
+            if self._pulse_dirty:
+                # We need to debounce otherwise we get triggered on
+                # multiple events. 20ms seems to be ok...
+                timeout = 0.02
+            elif timeout is not None:
+                timeout = None
+                self._query_default_sink()
+
+    def _query_default_sink(self):
+        pending_indices = self._pending_indices
+        self._pending_indices = set()
         try:
-            with self._timers_lock:
-                del self._timers[index]
-
-            sink = self._pulse_query.sink_default_get()
-            volume = sink.volume
-            if self.current_sink == "" or self.mute != sink.mute:
-                self.mute = sink.mute
-
-            if self.volume != volume.value_flat:
-                self.volume = volume.value_flat
-
-            if self.current_sink != sink.name:
-                self.current_sink = sink.name
+            if self._default_sink_idx is None:
+                sink = self._pulse.sink_default_get()
+                self._default_sink_idx = sink.index
+            elif self._default_sink_idx in pending_indices:
+                sink = self._pulse.sink_info(self._default_sink_idx)
+            else:
+                return
         except Exception:
+            self._default_sink_idx = None
             logger.exception("Recoverable error in pulse event")
+            return
+
+        state = (bool(sink.mute), sink.volume.value_flat, sink.name)
+        if state != self._last_state:
+            self._last_state = state
+            GLib.idle_add(self._on_sink_changed, *state)
+
+    def _on_sink_changed(self, mute, volume, name):
+        # Handlers of mute and volume run once both are updated
+        with self.freeze_notify():
+            self.mute = mute
+            self.volume = volume
+            self.current_sink = name
         return False
 
+    def _volume_to_icon(self, volume: float) -> Gio.Icon:
+        if volume > 1.0:
+            return self._icons["overamplified"]
+        elif volume > 0.66:
+            return self._icons["high"]
+        elif volume > 0.33:
+            return self._icons["medium"]
+        elif volume <= 0.0:
+            return self._icons["muted"]
+        return self._icons["low"]
+
     def new_model(self):
-        if not self._pulse_event_listen_thread.is_alive():
+        if not self.is_started():
             raise ValueError("PulseAudioMonitor has not been started")
 
         model = StatusModel("pulse", self.levels)
-
-        def volume_to_icon_name(volume):
-            icon_name = "audio-volume-low-symbolic"
-            if volume > 1.0:
-                icon_name = "audio-volume-overamplified-symbolic"
-            elif volume > 0.66:
-                icon_name = "audio-volume-high-symbolic"
-            elif volume > 0.33:
-                icon_name = "audio-volume-medium-symbolic"
-            elif volume <= 0.0:
-                icon_name = "audio-volume-muted-symbolic"
-            return icon_name
+        last_icon = None
 
         def update_icon(binding, prop):
+            nonlocal last_icon
             if self.mute:
-                icon_name = "audio-volume-muted-symbolic"
+                icon = self._icons["muted"]
             else:
-                icon_name = volume_to_icon_name(self.volume)
-            model.icon = Gio.ThemedIcon.new_with_default_fallbacks(icon_name)
+                icon = self._volume_to_icon(self.volume)
 
-        def transform_volume_to_icon(binding, volume):
-            if not self.mute:
-                icon_name = volume_to_icon_name(volume)
-                model.icon = Gio.ThemedIcon.new_with_default_fallbacks(icon_name)
+            if icon is not last_icon:
+                last_icon = icon
+                model.icon = icon
 
         self.bind_property("volume", model, "value")
-        self.bind_property(
-            "volume", model, "icon", transform_to=transform_volume_to_icon
-        )
+        self.connect("notify::volume", update_icon)
         self.connect("notify::mute", update_icon)
         update_icon(None, None)
         return model